@@ -1,46 +1,334 @@
 import os
+import json
+import errno
 import math
 import requests
+import wave
+import threading
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from requests.adapters import HTTPAdapter
 
 from dotenv import load_dotenv
-from moviepy import VideoFileClip
+from googleapiclient.discovery import Resource
+from googleapiclient.http import MediaIoBaseDownload
+from moviepy.config import FFMPEG_BINARY
 
 # 載入 .env 內容到環境變數，並強制更新
 if not load_dotenv(override=True):
     print("警告：.env 檔案不存在或解析失敗，請確認它位於專案根目錄。")
 
+# Chirp 使用的 raw PCM 格式：16kHz、mono、16-bit LINEAR16
+AUDIO_SAMPLE_RATE = 16000
+AUDIO_SAMPLE_WIDTH = 2
+
+# Range 位移以原始位元組計算，需避免伺服器壓縮回應內容
+_IDENTITY_ENCODING = {"Accept-Encoding": "identity"}
+
+
+def _create_download_session(pool_size: int) -> requests.Session:
+    """
+    建立可重複使用連線的 requests.Session，連線池大小與平行下載數一致。
+
+    Args:
+        pool_size (int): 連線池大小。
+
+    Returns:
+        requests.Session: 已掛載 HTTPAdapter 的 Session。
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _probe_range_support(
+        session: requests.Session,
+        url: str,
+        timeout: float) -> Tuple[Optional[int], bool, Optional[str]]:
+    """
+    以 `Range: bytes=0-0` 探測伺服器是否支援分段下載，並取得檔案大小與版本識別。
+
+    Returns:
+        Tuple[Optional[int], bool, Optional[str]]: (檔案大小, 是否支援 Range, 版本識別)。
+        大小未知時為 None；版本識別為 strong ETag 或 Last-Modified，可用於 `If-Range`。
+    """
+    headers = {"Range": "bytes=0-0", **_IDENTITY_ENCODING}
+    with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        etag = response.headers.get("ETag")
+        # If-Range 只接受 strong ETag，weak ETag 時改用 Last-Modified
+        validator = etag if etag and not etag.startswith("W/") else response.headers.get("Last-Modified")
+
+        content_range = response.headers.get("Content-Range", "")
+        if response.status_code == 206 and "/" in content_range:
+            total = content_range.rsplit("/", 1)[1]
+            if total.isdigit():
+                return int(total), True, validator
+        length = response.headers.get("Content-Length")
+        return (int(length) if length and length.isdigit() else None), False, validator
+
+
+def _resume_headers(offset: int, end: Optional[int], validator: Optional[str]) -> Dict[str, str]:
+    """
+    組出續傳用的 Range 請求標頭；有版本識別時加上 `If-Range`，檔案已變更時伺服器會回傳完整內容而非 206。
+    """
+    headers = {"Range": f"bytes={offset}-{'' if end is None else end}", **_IDENTITY_ENCODING}
+    if validator:
+        headers["If-Range"] = validator
+    return headers
+
+
+def _read_state(state_path: str) -> Optional[Dict[str, Any]]:
+    """
+    讀取續傳進度檔，不存在或損毀時回傳 None。
+    """
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_state(
+        state_path: str,
+        total_size: Optional[int],
+        validator: Optional[str],
+        segments: Optional[List[List[int]]]) -> None:
+    """
+    將續傳進度寫入 state 檔（先寫暫存檔再取代，避免中斷時留下損毀的 JSON）。
+
+    segments 為 None 表示單一連線下載，進度即 `.part` 檔的長度。
+    """
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"size": total_size, "validator": validator, "segments": segments}, f)
+    os.replace(tmp_path, state_path)
+
+
+def _load_segments(
+        state_path: str,
+        part_path: str,
+        total_size: int,
+        validator: Optional[str],
+        segment_size: int) -> List[List[int]]:
+    """
+    讀取平行下載的續傳進度；若 `.part` 檔不存在、大小不符或遠端檔案已變更，則重新切割區段。
+
+    每個區段為 [start, end, downloaded]，end 為包含的最後一個位元組。
+    """
+    state = _read_state(state_path)
+    if (state
+            and isinstance(state.get("segments"), list)
+            and state.get("size") == total_size
+            and state.get("validator") == validator
+            and os.path.exists(part_path)
+            and os.path.getsize(part_path) == total_size):
+        return state["segments"]
+
+    return [
+        [start, min(start + segment_size, total_size) - 1, 0]
+        for start in range(0, total_size, segment_size)
+    ]
+
+
+def _download_ranged(
+        session: requests.Session,
+        url: str,
+        part_path: str,
+        total_size: int,
+        validator: Optional[str],
+        chunk_size: int,
+        segment_size: int,
+        num_workers: int,
+        timeout: float) -> None:
+    """
+    以多條 HTTP Range 連線平行下載，並用 `os.pwrite` 寫入預先配置大小的檔案。
+    """
+    state_path = f"{part_path}.state"
+    segments = _load_segments(state_path, part_path, total_size, validator, segment_size)
+    lock = threading.Lock()
+    # 任一區段失敗或被中斷時通知其他執行中的區段停止
+    stop = threading.Event()
+
+    fd = os.open(part_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if os.fstat(fd).st_size != total_size:
+            os.ftruncate(fd, total_size)
+        if hasattr(os, "posix_fallocate"):
+            # ftruncate 只產生 sparse file，實際配置磁碟空間才能在開始下載前就發現空間不足
+            try:
+                os.posix_fallocate(fd, 0, total_size)
+            except OSError as e:
+                if e.errno not in (errno.EINVAL, errno.EOPNOTSUPP):
+                    raise
+
+        def fetch(segment: List[int]) -> None:
+            start, end, _ = segment
+            offset = start + segment[2]
+            if offset > end or stop.is_set():
+                return
+            headers = _resume_headers(offset, end, validator)
+            with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                if response.status_code != 206:
+                    raise requests.HTTPError(
+                        f"Range 請求未回傳 206（收到 {response.status_code}），遠端檔案可能已變更",
+                        response=response)
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    if stop.is_set():
+                        return
+                    if not chunk:
+                        continue
+                    view = memoryview(chunk)[:end + 1 - offset]
+                    while view:
+                        # pwrite 可能只寫入部分資料（例如磁碟已滿），需寫完剩餘部分
+                        written = os.pwrite(fd, view, offset)
+                        if written == 0:
+                            raise OSError(errno.ENOSPC, f"無法寫入 {part_path}")
+                        offset += written
+                        view = view[written:]
+                        # 只記錄已實際寫入磁碟的進度
+                        with lock:
+                            segment[2] = offset - start
+                    if offset > end:
+                        break
+            if offset <= end:
+                raise requests.ConnectionError(f"區段 {start}-{end} 下載不完整")
+
+        pending = [s for s in segments if s[0] + s[2] <= s[1]]
+        done_bytes = total_size - sum(s[1] + 1 - s[0] - s[2] for s in pending)
+        if done_bytes:
+            print(f"  續傳：已完成 {done_bytes / total_size:.0%}")
+
+        try:
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                futures = [executor.submit(fetch, s) for s in pending]
+                try:
+                    for i, future in enumerate(as_completed(futures), 1):
+                        future.result()
+                        with lock:
+                            _save_state(state_path, total_size, validator, segments)
+                        print(f"  已完成區段 {i}/{len(futures)}")
+                except BaseException:
+                    # 任一區段失敗即取消尚未開始的區段，並讓執行中的區段在目前 chunk 後停止
+                    stop.set()
+                    for future in futures:
+                        future.cancel()
+                    raise
+        finally:
+            # 無論成功與否都記錄進度，下次呼叫即可從中斷處續傳
+            with lock:
+                _save_state(state_path, total_size, validator, segments)
+    finally:
+        os.close(fd)
+
+    os.remove(state_path)
+
+
+def _download_single_stream(
+        session: requests.Session,
+        url: str,
+        part_path: str,
+        total_size: Optional[int],
+        validator: Optional[str],
+        chunk_size: int,
+        timeout: float) -> None:
+    """
+    單一連線下載；若伺服器接受 Range 且遠端檔案未變更，則從既有的部分檔案接續下載。
+    """
+    state_path = f"{part_path}.state"
+    state = _read_state(state_path)
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    # 只有同一個遠端版本留下的單一連線部分檔才能接續；
+    # 平行下載的部分檔已預先配置大小，無法以檔案長度判斷進度
+    if (not state
+            or state.get("segments") is not None
+            or state.get("size") != total_size
+            or state.get("validator") != validator
+            or (total_size is not None and offset > total_size)):
+        offset = 0
+
+    _save_state(state_path, total_size, validator, None)
+    if not (total_size is not None and offset and offset == total_size):
+        headers = _resume_headers(offset, None, validator) if offset else dict(_IDENTITY_ENCODING)
+        with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            # 伺服器忽略 Range 或檔案已變更時會回傳完整內容，需從頭覆寫
+            mode = "ab" if offset and response.status_code == 206 else "wb"
+            with open(part_path, mode) as f:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    if chunk:
+                        f.write(chunk)
+
+    os.remove(state_path)
+
 
 def download_direct_video(
         url: str,
         output_path: str = ".",
-        filename: str = "test_video.mp4") -> str:
+        filename: str = "test_video.mp4",
+        chunk_size: int = 1024 * 1024,
+        segment_size: int = 32 * 1024 * 1024,
+        num_workers: int = 8,
+        timeout: float = 60,
+        session: Optional[requests.Session] = None) -> str:
     """
     從指定 URL 下載影片並儲存為指定檔案。
 
+    若伺服器支援 HTTP Range，會以多條連線平行下載各區段並直接寫入預先配置的檔案；
+    否則退回單一連線下載。下載中途失敗時保留 `.part` 檔與進度，再次呼叫即可續傳。
+
     Args:
-        url (str): YouTube 影片網址。
+        url (str): 影片直連網址。
         output_path (str): 影片儲存資料夾。
         filename (str): 下載後的檔名（含副檔名 .mp4）。
+        chunk_size (int): 每次讀取並寫入的位元組數，預設 1 MiB。
+        segment_size (int): 平行下載時每個 Range 區段的大小，預設 32 MiB。
+        num_workers (int): 平行下載的連線數，預設 8。
+        timeout (float): 連線與讀取逾時秒數。
+        session (Optional[requests.Session]): 可重複使用的 Session，未提供時自動建立。
+            自行提供時，其 HTTPAdapter 的連線池（pool_maxsize）需至少為 num_workers，
+            否則多出的連線會被丟棄而無法重複使用。
 
     Returns:
         str: 下載後影片的完整路徑。
+
+    Raises:
+        requests.RequestException: 下載失敗時拋出。
+        OSError: 磁碟空間不足等寫入錯誤時拋出。
     """
     os.makedirs(output_path, exist_ok=True)
     file_path = os.path.join(output_path, filename)
+    part_path = f"{file_path}.part"
+
+    own_session = session is None
+    if own_session:
+        session = _create_download_session(num_workers)
 
     print(f"📥 下載影片：{url}")
-    response = requests.get(url, stream=True)
-    if response.status_code == 200:
-        with open(file_path, "wb") as f:
-            for chunk in response.iter_content(chunk_size=1024):
-                if chunk:
-                    f.write(chunk)
-        print(f"✅ 影片下載完成：{file_path}")
-        return file_path
-    else:
-        print(f"❌ 下載失敗，HTTP 狀態碼：{response.status_code}")
-        exit(1)
+    try:
+        total_size, accept_ranges, validator = _probe_range_support(session, url, timeout)
+        if accept_ranges and total_size and num_workers > 1 and hasattr(os, "pwrite"):
+            print(f"  平行下載：{total_size / 1024 ** 2:.1f} MB，{num_workers} 條連線")
+            _download_ranged(
+                session, url, part_path, total_size, validator,
+                chunk_size, segment_size, num_workers, timeout)
+        else:
+            _download_single_stream(
+                session, url, part_path, total_size, validator, chunk_size, timeout)
+    except (requests.RequestException, OSError) as e:
+        print(f"❌ 下載失敗：{e}")
+        raise
+    finally:
+        if own_session:
+            session.close()
+
+    os.replace(part_path, file_path)
+    print(f"✅ 影片下載完成：{file_path}")
+    return file_path
 
 
 def download_youtube_video(
@@ -74,49 +362,215 @@ def download_youtube_video(
     return filepath
 
 
-def extract_audio(video_path: str, output_dir: str, segment_duration: int = 30):
+def _ffmpeg_pcm_command(input_path: str) -> List[str]:
+    """
+    組出將輸入影片第一條音軌解碼為 16kHz mono LINEAR16 raw PCM 並輸出至 stdout 的 ffmpeg 指令。
+
+    Args:
+        input_path (str): ffmpeg 輸入，可為檔案路徑或 "pipe:0"。
+
+    Returns:
+        List[str]: ffmpeg 指令參數列表。
     """
-    從影片檔案中提取音訊，並將其轉為 16kHz mono 的 .wav 格式。
-    若指定 segment_duration，則會自動切割為多個檔案。
+    return [
+        FFMPEG_BINARY,
+        "-v", "error",
+        "-i", input_path,
+        "-map", "0:a:0",
+        "-vn",
+        "-ac", "1",
+        "-ar", str(AUDIO_SAMPLE_RATE),
+        "-acodec", "pcm_s16le",
+        "-f", "s16le",
+        "pipe:1",
+    ]
+
+
+def _write_wav(output_filename: str, pcm: memoryview) -> None:
+    """
+    將 16kHz mono LINEAR16 raw PCM 寫成 .wav 檔。
+    """
+    with wave.open(output_filename, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(AUDIO_SAMPLE_WIDTH)
+        wav_file.setframerate(AUDIO_SAMPLE_RATE)
+        wav_file.writeframes(pcm)
+
+
+def extract_audio(
+        video_path: str,
+        output_dir: Optional[str] = None,
+        segment_duration: int = 30) -> List[memoryview]:
+    """
+    從影片檔案中提取音訊，解碼為 16kHz mono LINEAR16 raw PCM，並依 segment_duration 切割。
+
+    整段音訊只解碼一次，回傳的每個片段都是同一塊 buffer 的 memoryview，不會額外複製。
+    若指定 output_dir，則同時將每段寫成 .wav 檔。
 
     Args:
         video_path (str): 輸入的 mp4 影片路徑。
-        output_dir (str): 輸出的音訊資料夾。
+        output_dir (Optional[str]): 輸出的音訊資料夾，為 None 時不寫入任何檔案。
         segment_duration (int): 每段音訊的長度（秒）。預設為 30 秒。
+
+    Returns:
+        List[memoryview]: 依序排列的 raw PCM 音訊片段，可直接傳給 `transcribe_pcm_with_chirp`。
     """
     print(f"🎵 正在提取音訊：{video_path}")
-    os.makedirs(output_dir, exist_ok=True)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
 
-    video = VideoFileClip(video_path)
-    if video.audio is None:
-        print("❌ 影片中未找到音訊！")
-        return
+    result = subprocess.run(
+        _ffmpeg_pcm_command(video_path),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        stderr = result.stderr.decode("utf-8", errors="replace")
+        if "matches no streams" in stderr:
+            print("❌ 影片中未找到音訊！")
+            return []
+        raise subprocess.CalledProcessError(result.returncode, result.args, stderr=stderr)
 
-    audio = video.audio
-    duration = audio.duration
-    num_segments = math.ceil(duration / segment_duration)
+    pcm = memoryview(result.stdout)
+    segment_bytes = segment_duration * AUDIO_SAMPLE_RATE * AUDIO_SAMPLE_WIDTH
+    duration = len(pcm) / (AUDIO_SAMPLE_RATE * AUDIO_SAMPLE_WIDTH)
+    num_segments = math.ceil(len(pcm) / segment_bytes)
 
     print(f"📌 總音訊時長：{duration:.2f} 秒，切割為 {num_segments} 段，每段 {segment_duration} 秒")
 
+    segments: List[memoryview] = []
     for i in range(num_segments):
-        start = i * segment_duration
-        end = min((i + 1) * segment_duration, duration) # 確保不超出範圍
-        output_filename = os.path.join(output_dir, f"audio_part_{i+1:02d}.wav")
-
-        print(f"🔹 處理時間段：{start:.2f} ~ {end:.2f} 秒 -> {output_filename}")
-
-        # 擷取該時間範圍的音訊
-        # **使用 `subclipped()`（MoviePy 2.1.2 版本）**
-        video_segment = video.subclipped(start, end)
-        segment = video_segment.audio  # 取得剪輯後的音訊
-        segment.write_audiofile(
-            output_filename,
-            codec="pcm_s16le",
-            fps=16000,
-            ffmpeg_params=["-ac", "1"] # 確保輸出為單聲道
-        )
-
-    print(f"✅ 音訊切割完成，儲存至 {output_dir}")
+        # memoryview 切片只是原 buffer 的視圖，不會複製資料
+        segment = pcm[i * segment_bytes:(i + 1) * segment_bytes]
+        segments.append(segment)
+
+        if output_dir:
+            start = i * segment_duration
+            end = min((i + 1) * segment_duration, duration) # 確保不超出範圍
+            output_filename = os.path.join(output_dir, f"audio_part_{i+1:02d}.wav")
+            print(f"🔹 處理時間段：{start:.2f} ~ {end:.2f} 秒 -> {output_filename}")
+            _write_wav(output_filename, segment)
+
+    if output_dir:
+        print(f"✅ 音訊切割完成，儲存至 {output_dir}")
+    else:
+        print(f"✅ 音訊切割完成，共 {num_segments} 段")
+    return segments
+
+
+def extract_audio_from_drive(
+        drive_service: Resource,
+        file_id: str,
+        output_dir: Optional[str] = None,
+        segment_duration: int = 30,
+        chunk_size: int = 8 * 1024 * 1024,
+        num_retries: int = 5) -> Iterator[bytes]:
+    """
+    直接將 Google Drive 檔案的位元組串流送入 ffmpeg 解碼，邊下載邊產生 16kHz mono LINEAR16 raw PCM 片段，
+    影片本身不會寫入磁碟。
+
+    下載在背景執行緒進行，每次只保留一個 chunk；ffmpeg 未及消化時寫入會被 pipe 阻塞，
+    因此記憶體用量受 chunk_size 與單一片段大小限制。
+
+    注意：輸入無法 seek，MP4 需將 moov atom 置於檔頭（faststart）；
+    否則請改用 `download_drive_files_from_list` 下載後再呼叫 `extract_audio`。
+    drive_service 會在背景執行緒中使用，而其 httplib2 `Http` 物件並非 thread-safe，
+    迭代期間請勿同時以同一個 drive_service 呼叫其他 API。
+
+    Args:
+        drive_service (Resource): Google Drive API 服務物件。
+        file_id (str): Google Drive 檔案 ID。
+        output_dir (Optional[str]): 輸出的音訊資料夾，為 None 時不寫入任何檔案。
+        segment_duration (int): 每段音訊的長度（秒）。預設為 30 秒。
+        chunk_size (int): 每次向 Drive 請求的位元組數，預設 8 MiB。
+        num_retries (int): 每個 chunk 遇到暫時性錯誤（5xx、連線中斷）時的重試次數，預設 5。
+            已送入 ffmpeg 的資料無法重來，單次失敗即會中止整個提取。
+
+    Yields:
+        bytes: 依序產生的 raw PCM 音訊片段，可直接傳給 `transcribe_pcm_with_chirp`。
+    """
+    print(f"🎵 正在從 Google Drive 串流提取音訊：{file_id}")
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    # pipe 輸入的 demux 錯誤（如 MP4 未 faststart）預設仍回傳 0，需以 -xerror 讓 ffmpeg 回報失敗
+    command = _ffmpeg_pcm_command("pipe:0")
+    command.insert(1, "-xerror")
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE)
+    feed_errors: List[Exception] = []
+
+    def feed() -> None:
+        try:
+            request = drive_service.files().get_media(fileId=file_id)
+            downloader = MediaIoBaseDownload(process.stdin, request, chunksize=chunk_size)
+            done = False
+            while not done:
+                status, done = downloader.next_chunk(num_retries=num_retries)
+                if status:
+                    print(f"  已下載 {int(status.progress() * 100)}%")
+        except BrokenPipeError:
+            # ffmpeg 已提前結束（解碼失敗或呼叫端停止讀取），錯誤由主執行緒回報
+            pass
+        except Exception as e:
+            feed_errors.append(e)
+        finally:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+    # 同步讀取 stderr，避免 pipe 塞滿造成 ffmpeg 卡住
+    stderr_chunks: List[bytes] = []
+    drainer = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+    feeder = threading.Thread(target=feed, daemon=True)
+    drainer.start()
+    feeder.start()
+
+    segment_bytes = segment_duration * AUDIO_SAMPLE_RATE * AUDIO_SAMPLE_WIDTH
+    num_segments = 0
+    try:
+        while True:
+            segment = process.stdout.read(segment_bytes)
+            if not segment:
+                break
+
+            if output_dir:
+                start = num_segments * segment_duration
+                end = start + len(segment) / (AUDIO_SAMPLE_RATE * AUDIO_SAMPLE_WIDTH)
+                output_filename = os.path.join(output_dir, f"audio_part_{num_segments+1:02d}.wav")
+                print(f"🔹 處理時間段：{start:.2f} ~ {end:.2f} 秒 -> {output_filename}")
+                _write_wav(output_filename, memoryview(segment))
+
+            num_segments += 1
+            yield segment
+
+        feeder.join()
+        returncode = process.wait()
+    finally:
+        # 呼叫端提前停止迭代時，結束 ffmpeg 讓背景下載隨之中止
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        feeder.join()
+        drainer.join()
+        process.stderr.close()
+
+    if feed_errors:
+        print(f"❌ 從 Google Drive 下載失敗：{feed_errors[0]}")
+        raise feed_errors[0]
+
+    stderr = b"".join(stderr_chunks).decode("utf-8", errors="replace")
+    if returncode != 0:
+        if "matches no streams" in stderr:
+            print("❌ 影片中未找到音訊！")
+            return
+        raise subprocess.CalledProcessError(returncode, process.args, stderr=stderr)
+
+    print(f"✅ 音訊串流提取完成，共 {num_segments} 段")
 
 
 if __name__ == "__main__":
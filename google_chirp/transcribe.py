@@ -1,6 +1,6 @@
 import os
 import sys
-from typing import List, Dict
+from typing import Any, List, Dict, Union
 
 # 將專案根目錄加入模組搜尋路徑
 root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -14,41 +14,35 @@ from google.api_core.client_options import ClientOptions
 
 from common.google_service import get_google_service
 from google_chirp.google_speech_utils import create_speech_v2_client, create_recognizer
+from google_chirp.preprocess import AUDIO_SAMPLE_RATE
 
 # 載入 .env 內容到環境變數
 if not load_dotenv():
     print("警告：.env 檔案不存在或解析失敗，請確認它位於專案根目錄。")
 
 
-def transcribe_audio_with_chirp(
+def _recognize_to_file(
     speech_client: SpeechClient,
-    audio_path: str,
+    content: bytes,
+    decoding_config: Dict[str, Any],
     output_path: str,
     recongizer_name: str,
-    language_codes: List[str] = ["cmn-Hant-TW"],
-    model: str = "chirp_2"
+    language_codes: List[str],
+    model: str
 ) -> None:
     """
-    使用 Google Cloud Speech-to-Text V2 API 轉錄音訊檔案。
+    送出辨識請求並將轉錄結果寫入檔案。
 
     Args:
-        speech_client (SpeechClient): Google Cloud Speech-to-Text V2 API 客戶端。
-        audio_path (str): 要轉錄的音訊檔案路徑。
-        output_path (str): 轉錄結果輸出檔案的路徑。
-        recongizer_name (str): full recognizer 名稱，例如 "projects/{project_id}/locations/{location}/recognizers/{recognizer_id}"。
-        language_codes (List[str]): 語言代碼列表，預設為 ["cmn-Hant-TW"]。
-        model (str): 語音識別模型，預設為 "chirp_2"。
+        decoding_config (Dict[str, Any]): RecognitionConfig 的解碼設定，
+            例如 {"auto_decoding_config": ...} 或 {"explicit_decoding_config": ...}。
     """
     if not isinstance(speech_client, SpeechClient):
         raise TypeError(f"speech_client 必須是 SpeechClient，實際收到 {type(speech_client)}")
 
-    # 讀取音訊檔案
-    with open(audio_path, "rb") as audio_file:
-        content = audio_file.read()
-
     # 設定辨識配置
     config = cloud_speech.RecognitionConfig(
-        auto_decoding_config=cloud_speech.AutoDetectDecodingConfig(),
+        **decoding_config,
         language_codes=language_codes,  # 明確指定語言代碼
         model=model,
         features=cloud_speech.RecognitionFeatures(
@@ -78,6 +72,79 @@ def transcribe_audio_with_chirp(
     print(f"✅ 轉錄完成：{output_path}")
 
 
+def transcribe_audio_with_chirp(
+    speech_client: SpeechClient,
+    audio_path: str,
+    output_path: str,
+    recongizer_name: str,
+    language_codes: List[str] = ["cmn-Hant-TW"],
+    model: str = "chirp_2"
+) -> None:
+    """
+    使用 Google Cloud Speech-to-Text V2 API 轉錄音訊檔案。
+
+    Args:
+        speech_client (SpeechClient): Google Cloud Speech-to-Text V2 API 客戶端。
+        audio_path (str): 要轉錄的音訊檔案路徑。
+        output_path (str): 轉錄結果輸出檔案的路徑。
+        recongizer_name (str): full recognizer 名稱，例如 "projects/{project_id}/locations/{location}/recognizers/{recognizer_id}"。
+        language_codes (List[str]): 語言代碼列表，預設為 ["cmn-Hant-TW"]。
+        model (str): 語音識別模型，預設為 "chirp_2"。
+    """
+    # 讀取音訊檔案，由服務自動判斷格式
+    with open(audio_path, "rb") as audio_file:
+        content = audio_file.read()
+
+    _recognize_to_file(
+        speech_client=speech_client,
+        content=content,
+        decoding_config={"auto_decoding_config": cloud_speech.AutoDetectDecodingConfig()},
+        output_path=output_path,
+        recongizer_name=recongizer_name,
+        language_codes=language_codes,
+        model=model
+    )
+
+
+def transcribe_pcm_with_chirp(
+    speech_client: SpeechClient,
+    audio_content: Union[bytes, memoryview],
+    output_path: str,
+    recongizer_name: str,
+    language_codes: List[str] = ["cmn-Hant-TW"],
+    model: str = "chirp_2",
+    sample_rate_hertz: int = AUDIO_SAMPLE_RATE
+) -> None:
+    """
+    使用 Google Cloud Speech-to-Text V2 API 轉錄 mono LINEAR16 raw PCM 音訊。
+
+    Args:
+        speech_client (SpeechClient): Google Cloud Speech-to-Text V2 API 客戶端。
+        audio_content (Union[bytes, memoryview]): `extract_audio` 或 `extract_audio_from_drive` 產生的 raw PCM 片段。
+        output_path (str): 轉錄結果輸出檔案的路徑。
+        recongizer_name (str): full recognizer 名稱，例如 "projects/{project_id}/locations/{location}/recognizers/{recognizer_id}"。
+        language_codes (List[str]): 語言代碼列表，預設為 ["cmn-Hant-TW"]。
+        model (str): 語音識別模型，預設為 "chirp_2"。
+        sample_rate_hertz (int): raw PCM 的取樣率，預設為 AUDIO_SAMPLE_RATE（16kHz）。
+    """
+    # raw PCM 不含檔頭，需明確指定編碼方式；protobuf 的 bytes 欄位不接受 memoryview
+    _recognize_to_file(
+        speech_client=speech_client,
+        content=bytes(audio_content),
+        decoding_config={
+            "explicit_decoding_config": cloud_speech.ExplicitDecodingConfig(
+                encoding=cloud_speech.ExplicitDecodingConfig.AudioEncoding.LINEAR16,
+                sample_rate_hertz=sample_rate_hertz,
+                audio_channel_count=1
+            )
+        },
+        output_path=output_path,
+        recongizer_name=recongizer_name,
+        language_codes=language_codes,
+        model=model
+    )
+
+
 if __name__ == "__main__":
     # 讀取環境變數
     PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT")